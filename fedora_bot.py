@@ -3,14 +3,46 @@
 """Just a small bot to take care of Koji builds and Bodhi updates"""
 
 import argparse
-import subprocess
+import collections
+import functools
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
 import sys
 import os
+import random
 import re
-import pexpect
+import time
+import orjson
 import requests
 from requests.adapters import HTTPAdapter, Retry
-from slack_sdk.webhook import WebhookClient
+
+
+KOJI_HUB = "https://koji.fedoraproject.org/kojihub"
+
+# The Version tag of a spec file
+VERSION_RE = re.compile(rb'^Version:\s*([0-9.]+)', re.MULTILINE)
+
+# Where notifications are posted and the link to this run they refer to
+SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL')
+GITHUB_URL = f"{os.getenv('GITHUB_SERVER_URL')}/{os.getenv('GITHUB_REPOSITORY')}/actions/runs/{os.getenv('GITHUB_RUN_ID')}"
+
+# Seconds to wait for a Fedora service to accept a connection and to respond
+# before (re)trying
+HTTP_CONNECT_TIMEOUT = 5
+HTTP_READ_TIMEOUT = 30
+HTTP_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+# How many components are checked at once, and how many pull request flags
+# are fetched at once for each of them
+COMPONENT_WORKERS = 4
+FLAG_WORKERS = 8
+
+# How long the list of active Fedora releases is cached on disk
+RELEASES_CACHE_TTL = 6 * 60 * 60
+
+# How long the version found in a component's dist-git is cached on disk
+VERSION_CACHE_TTL = 15 * 60
 
 
 class fg:  # pylint: disable=too-few-public-methods
@@ -22,146 +54,148 @@ class fg:  # pylint: disable=too-few-public-methods
     RESET = '\033[0m'  # reset
 
 
+ERROR_PREFIX = f"{fg.ERROR}{fg.BOLD}Error:{fg.RESET} "
+INFO_PREFIX = f"{fg.INFO}{fg.BOLD}Info:{fg.RESET} "
+OK_PREFIX = f"{fg.OK}{fg.BOLD}OK:{fg.RESET} "
+
+
 def msg_error(body):
     """Print error and exit"""
-    print(f"{fg.ERROR}{fg.BOLD}Error:{fg.RESET} {body}")
+    print(f"{ERROR_PREFIX}{body}")
     sys.exit(1)
 
 
 def msg_info(body):
     """Print info message"""
-    print(f"{fg.INFO}{fg.BOLD}Info:{fg.RESET} {body}")
+    print(f"{INFO_PREFIX}{body}")
 
 
 def msg_ok(body):
     """Print ok status message"""
-    print(f"{fg.OK}{fg.BOLD}OK:{fg.RESET} {body}")
+    print(f"{OK_PREFIX}{body}")
 
 
-def run_command(argv):
-    """Run a shellcommand and return stdout"""
-    result = subprocess.run(  # pylint: disable=subprocess-run-check
-        argv,
-        capture_output=True,
-        text=True,
-        encoding='utf-8')
-
-    if result.returncode == 0:
-        ret = result.stdout.strip()
-    else:
-        ret = result.stderr.strip()
-
-    return ret
+@functools.lru_cache(maxsize=None)
+def slack_webhook():
+    """Return the Slack webhook client, created once on first use"""
+    # slack_sdk is only needed when there is something to post
+    from slack_sdk.webhook import WebhookClient  # pylint: disable=import-outside-toplevel
 
-
-def kinit(args):
-    """Get a Kerberos ticket for FEDORAPROJECT.ORG"""
-    domain = "FEDORAPROJECT.ORG"
-    print(f"      Get a Kerberos ticket for {args.user}@{domain}")
-
-    child = pexpect.spawn(f'kinit {args.user}@{domain}', timeout=60,
-                          echo=False)
-    try:
-        child.expect(".*:")
-        child.sendline(args.password)
-    except OSError as err:
-        msg_error(f"kinit with pexpect raised OSError: {err}")
-
-    child.wait()
-    res = run_command(['klist'])
-    if "not found" in res:
-        msg_error(f"An error occurred getting a valid Kerberos ticket:\n{res}")
+    return WebhookClient(SLACK_WEBHOOK_URL)
 
 
 def slack_notify(message: str):
     msg_ok(message)
 
-    url = os.getenv('SLACK_WEBHOOK_URL')
-    if not url:
+    if not SLACK_WEBHOOK_URL:
         return
 
-    github_server_url = os.getenv('GITHUB_SERVER_URL')
-    github_repository = os.getenv('GITHUB_REPOSITORY')
-    github_run_id = os.getenv('GITHUB_RUN_ID')
-    github_url = f"{github_server_url}/{github_repository}/actions/runs/{github_run_id}"
-
-    webhook = WebhookClient(url)
-
-    response = webhook.send(
+    response = slack_webhook().send(
         text="fallback",
         blocks=[
             {
                 "type": "section",
                 "text": {
                     "type": "mrkdwn",
-                    "text": f"<{github_url}|fedora-bot>: :fedora-new: {message}"
+                    "text": f"<{GITHUB_URL}|fedora-bot>: :fedora-new: {message}"
                 }
             }
         ])
-    assert response.status_code == 200
-    assert response.body == "ok"
+    if response.status_code != 200 or response.body != "ok":
+        raise RuntimeError(f"Slack notification failed: {response.status_code} {response.body!r}")
 
 
-def fedora_distgit_http_client() -> requests.Session:
+class JitteredRetry(Retry):
     """
-    Returns a configured http client for Fedora's dist-git. We need a custom
-    client in order to implement retries. These are needed because
+    Retry with exponential backoff (immediately, then after 2s, 4s, 8s, ...
+    with a backoff_factor of 1) capped at 30s plus some random jitter, so
+    concurrent requests don't all retry at the same moment.
+    """
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        if backoff <= 0:
+            return 0
+        return min(30, backoff) + random.uniform(0, 0.5)
+
+
+def fedora_http_client() -> requests.Session:
+    """
+    Returns a configured http client for Fedora's dist-git and Bodhi. We need
+    a custom client in order to implement retries. These are needed because
     src.fedoraproject.org proved to be slightly unreliable and without
-    retries, some fedora-bot runs failed.
+    retries, some fedora-bot runs failed. The client is shared by all
+    requests so connections are kept alive between them.
     """
-    retry_adapter = Retry(
-        total=3,
-        backoff_factor=0.1,
+    retry_adapter = JitteredRetry(
+        total=8,
+        connect=5,
+        read=5,
+        status=5,
+        backoff_factor=1.0,
         # POST isn't generally idempotent but we only use it to merge PRs
         # which actually is idempotent.
-        allowed_methods=["POST"] + list(Retry.DEFAULT_ALLOWED_METHODS),
-        # Enable retrying on retryable http codes.
-        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=["GET", "HEAD", "POST"],
+        # Enable retrying on retryable http codes, and wait as long as the
+        # server asks us to when rate limited.
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
     )
     session = requests.Session()
-    session.mount("https://src.fedoraproject.org/", HTTPAdapter(max_retries=retry_adapter))
+    # One pool per host is plenty (dist-git and Bodhi), but each pool has to
+    # keep enough connections alive for the concurrent flag lookups of all
+    # components checked at once.
+    session.mount("https://", HTTPAdapter(pool_connections=8, pool_maxsize=COMPONENT_WORKERS * FLAG_WORKERS,
+                                          max_retries=retry_adapter))
     return session
 
 
-def check_pull_request_flags(http, component, pr_id, num_tests):
+SESSION = fedora_http_client()
+
+
+def get_pull_request_flags(component, pr_id):
+    """Fetch the flags (test results) of a single pull request"""
+    req = SESSION.get(f'https://src.fedoraproject.org/api/0/rpms/{component}/pull-request/{pr_id}/flag', timeout=HTTP_TIMEOUT)
+    req.raise_for_status()
+    return orjson.loads(req.content)['flags']
+
+
+def check_pull_request_flags(component, pr_id, flags, num_tests):
     """
     Check the test results in the pull request, which are represented in Pagure as 'flags'
     As the test results (pagure flags) are not immediately available and there is no indication of running tests
     we have to hardcode the amount of test results to expect so we can verify all tests have passed.
     """
-    test_results = []
+    # Count the results by status in a single pass over the flags
+    test_results = collections.Counter(flag['status'] for flag in flags)
+    total = sum(test_results.values())
     success = False
 
-    req = http.get(f'https://src.fedoraproject.org/api/0/rpms/{component}/pull-request/{pr_id}/flag')
-    res = req.json()
-    for flag in res['flags']:
-        test_results.append(flag['status'])
-
-    if len(test_results) != num_tests: # check if the expected number of tests passed
-        msg_info(f"Only {len(test_results)}/{num_tests} tests have run, let's try again later.")
-    elif all(r == 'success' for r in test_results):
-        msg_ok(f"All {len(test_results)} tests passed so the pull-request can be merged.")
+    if total != num_tests: # check if the expected number of tests passed
+        msg_info(f"Only {total}/{num_tests} tests of pull request '{pr_id}' for {component} have run, let's try again later.")
+    elif test_results['success'] == total:
+        msg_ok(f"All {total} tests of pull request '{pr_id}' for {component} passed so the pull-request can be merged.")
         success = True
-    elif 'failure' in test_results:
-        msg_info(f"Pull request '{pr_id}' has {len(test_results)}/{num_tests} failed tests and therefore cannot be auto-merged.")
-    elif 'pending' in test_results:
-        msg_info("Some tests are still running, let's try again later")
+    elif test_results['failure']:
+        msg_info(f"Pull request '{pr_id}' for {component} has {test_results['failure']}/{num_tests} failed tests and therefore cannot be auto-merged.")
+    elif test_results['pending']:
+        msg_info(f"Some tests of pull request '{pr_id}' for {component} are still running, let's try again later")
     else:
-        msg_error("Something is wrong - maybe the amount of tests have changed?")
+        msg_error(f"Something is wrong with pull request '{pr_id}' for {component} - maybe the amount of tests have changed?")
 
     return success
 
 
-def merge_pull_request(http, args, component, pr_id):
+def merge_pull_request(args, component, pr_id):
     """Merge a single pull request"""
     url = f"https://src.fedoraproject.org/rpms/{component}/pull-request/{pr_id}"
 
-    req = http.post(f'https://src.fedoraproject.org/api/0/rpms/{component}/pull-request/{pr_id}/merge', headers={'Authorization': f'token {args.apikey}'})
-    res = req.json()
+    req = SESSION.post(f'https://src.fedoraproject.org/api/0/rpms/{component}/pull-request/{pr_id}/merge', headers={'Authorization': f'token {args.apikey}'},
+                       timeout=HTTP_TIMEOUT)
+    res = orjson.loads(req.content)
     if res['message'] == "Changes merged!":
         msg_ok(f"Merged pull request for {component}: {url}")
     else:
-        msg_info(res)
+        msg_info(f"Pull request for {component} was not merged: {res}")
 
 
 def merge_open_pull_requests(args, component, num_tests):
@@ -170,131 +204,281 @@ def merge_open_pull_requests(args, component, num_tests):
      1. it was created by packit
      2. all tests have passed
     """
-    http = fedora_distgit_http_client()
-    req = http.get(f'https://src.fedoraproject.org/api/0/rpms/{component}/pull-requests?author=packit')
-    res = req.json()
+    # Pagure lists 20 pull requests per page by default, ask for as many as
+    # it allows so a single request covers all open ones.
+    req = SESSION.get(f'https://src.fedoraproject.org/api/0/rpms/{component}/pull-requests',
+                      params={'author': 'packit', 'per_page': 100}, timeout=HTTP_TIMEOUT)
+    req.raise_for_status()
+    res = orjson.loads(req.content)
     if res['total_requests'] == 0:
         msg_ok(f"There are currently no open pull requests for {component}.")
         return
 
     msg_info(f"Found {res['total_requests']} open pull requests for {component}. Starting the merge train...")
 
-    for pr in res['requests']:
-        successful_checks = check_pull_request_flags(http, component, pr['id'], num_tests)
+    # Fetch the flags of all pull requests at once instead of one round-trip
+    # after the other, the merges below still happen in order.
+    with ThreadPoolExecutor(max_workers=FLAG_WORKERS) as executor:
+        flags = [executor.submit(get_pull_request_flags, component, pr['id']) for pr in res['requests']]
+
+    for pr, pr_flags in zip(res['requests'], flags):
+        successful_checks = check_pull_request_flags(component, pr['id'], pr_flags.result(), num_tests)
         if successful_checks:
-            merge_pull_request(http, args, component, pr['id'])
+            merge_pull_request(args, component, pr['id'])
 
 
-def update_bodhi(args, component, fedora):
+def check_bodhi_client():
+    """
+    Make sure bodhi-client is older than 6.0. update_bodhi logs in with the
+    Fedora account password, which the OIDC based client of 6.0 and later
+    doesn't accept anymore.
+    """
+    # pylint: disable=import-outside-toplevel
+    from importlib.metadata import version, PackageNotFoundError
+
+    try:
+        bodhi_version = version('bodhi-client')
+    except PackageNotFoundError:
+        msg_error("bodhi-client is not installed, it is needed to publish Bodhi updates.")
+
+    if int(bodhi_version.split('.')[0]) >= 6:
+        msg_error(f"bodhi-client {bodhi_version} is not supported, publishing Bodhi updates needs bodhi-client < 6.")
+
+
+def update_bodhi(args, component, fedora, nvr):
     """Publish a single Bodhi update"""
+    # pylint: disable=import-outside-toplevel
+    from bodhi.client.bindings import BodhiClient, BodhiClientException
+
     msg_info(f"Updating Bodhi for Fedora {fedora}...")
-    kinit(args)
-    child = pexpect.spawn("fedpkg update --type enhancement "
-                            f"--notes 'Update {component} to the latest version'",
-                            timeout=60, echo=False)
+
+    # Talk to Bodhi through its client library rather than driving
+    # 'fedpkg update' through a pty: the update refers to the build directly,
+    # so no dist-git checkout is needed, and the result comes back as data.
+    client = BodhiClient(username=args.user, password=args.password)
     try:
-        child.expect(".*:")
-        child.sendline(args.password)
-    except OSError as err:
-        msg_info(f"'fedpkg update' with pexpect raised OSError: {err}")
-
-    child.wait()
-    child.read()
-    res = str(child.before, 'UTF-8')
-    print(res)
-    if "update has been submitted" in res:
-        url = ""
-        for line in res.split("\n"):
-            if "https://bodhi.fedoraproject.org" in line:
-                url = line.strip()
-        slack_notify(f"<{url}|Bodhi update published> for *{component}* in *Fedora {fedora}*. :meow_checkmark:\nThis means the *release for Fedora {fedora} is complete*. :tada:")
-
-
-def publish_updates(args, component, fedoras):
-    """Update Bodhi for all active Fedora releases"""
-    work_dir = os.getcwd()
-    os.chdir(os.path.join(work_dir, component))
+        update = client.save(builds=nvr, type='enhancement',
+                             notes=f'Update {component} to the latest version')
+    except BodhiClientException as err:
+        msg_info(f"Creating the Bodhi update for {nvr} failed: {err}")
+        return
 
-    for fedora in fedoras:
-        run_command(['git', 'checkout', f"f{fedora}"])
-        print(f"      Checked out branch 'f{fedora}'")
-        update_bodhi(args, component, fedora)
+    url = update.get('url') or f"https://bodhi.fedoraproject.org/updates/{update['alias']}"
+    slack_notify(f"<{url}|Bodhi update published> for *{component}* in *Fedora {fedora}*. :meow_checkmark:\nThis means the *release for Fedora {fedora} is complete*. :tada:")
+
+
+def publish_updates(args, component, updates):
+    """Update Bodhi with the given builds of the active Fedora releases"""
+    # The updates of the individual releases are independent requests to
+    # Bodhi, so submit them concurrently.
+    with ThreadPoolExecutor(max_workers=len(updates)) as executor:
+        for future in [executor.submit(update_bodhi, args, component, fedora, nvr)
+                       for fedora, nvr in updates.items()]:
+            future.result()
 
 
-def get_latest_dist_git_release(component):
-    """Get the latest release version found in dist-git"""
-    print(f"      Cloning into 'https://src.fedoraproject.org/rpms/{component}.git'...")
-    work_dir = os.getcwd()
-    res = run_command(['git','clone',f"https://src.fedoraproject.org/rpms/{component}.git"])
-    if res:
-        print(res)
-    os.chdir(os.path.join(work_dir, component))
-    branch = run_command(['git', 'branch', '--show-current'])
-    print(f"      Checked out dist-git with branch '{branch}'")
+def cache_dir(*parts):
+    """Return a directory below the fedora-bot cache directory"""
+    cache_home = os.getenv('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(cache_home, 'fedora-bot', *parts)
+
+
+def read_cache(path, ttl):
+    """Return the JSON data cached in a file if it is younger than ttl seconds"""
+    try:
+        if time.time() - os.path.getmtime(path) < ttl:
+            with open(path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+    except (OSError, ValueError):
+        pass
+
+    return None
 
-    path = f'{component}.spec'
-    with open(path, 'r', encoding='utf-8') as file:
-        lines = file.readlines()
-        for line in lines:
-            if line.startswith("Version:"):
-                version = re.search('[0-9.]+', line)
 
-    os.chdir(work_dir)
+def write_cache(path, data):
+    """Store JSON data in a cache file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
 
-    if version.group(0) is None:
-        msg_error("Could not extract verson from specfile.")
 
-    return version.group(0)
+def spec_version(spec):
+    """Return the version declared in the given spec file contents (bytes), or None"""
+    version = VERSION_RE.search(spec)
+    if version is None:
+        return None
+    return version.group(1).decode()
 
 
-def get_missing_updates(component, fedoras):
-    """Check for existing Koji builds that have no Bodhi update published for any active Fedora release"""
-    version = get_latest_dist_git_release(component)
+@functools.lru_cache(maxsize=None)
+def get_latest_dist_git_release(component, refresh=False):
+    """
+    Get the latest release version found in dist-git. Consecutive runs
+    usually see the same version, so it is cached on disk for
+    VERSION_CACHE_TTL unless a refresh is requested.
+    """
+    cache_file = cache_dir('versions', f'{component}.json')
+    if not refresh:
+        cached = read_cache(cache_file, VERSION_CACHE_TTL)
+        if cached is not None:
+            print(f"      Using cached dist-git version of {component}")
+            return cached
+
+    # Only the spec file is needed, so fetch it from dist-git directly instead
+    # of cloning the repository.
+    branch = "rawhide"
+    print(f"      Fetching {component}.spec from dist-git branch '{branch}'")
+    req = SESSION.get(f'https://src.fedoraproject.org/rpms/{component}/raw/{branch}/f/{component}.spec',
+                      timeout=HTTP_TIMEOUT)
+    req.raise_for_status()
+    version = spec_version(req.content)
+
+    if version is None:
+        msg_error(f"Could not extract version from the specfile of {component}.")
+
+    write_cache(cache_file, version)
+    return version
+
+
+def get_complete_koji_builds(nvrs):
+    """Return the set of builds that completed in Koji, using a single multicall"""
+    import koji  # pylint: disable=import-outside-toplevel
+
+    # getBuild is an anonymous, read-only call, so let koji retry it on
+    # transient errors like the HTTP session does for dist-git and Bodhi.
+    session = koji.ClientSession(KOJI_HUB, opts={'anon_retry': True, 'max_retries': 5,
+                                                 'retry_interval': 1, 'timeout': HTTP_READ_TIMEOUT})
+    with session.multicall(strict=True) as multicall:
+        calls = {nvr: multicall.getBuild(nvr) for nvr in nvrs}
+
+    return {nvr for nvr, call in calls.items()
+            if call.result and call.result['state'] == koji.BUILD_STATES['COMPLETE']}
+
+
+def get_bodhi_updates(nvrs):
+    """Return the set of builds that are part of a Bodhi update, using a single query"""
+    nvrs = list(nvrs)
+    if not nvrs:
+        return set()
+
+    req = SESSION.get('https://bodhi.fedoraproject.org/updates/',
+                      params={'builds': ','.join(nvrs), 'rows_per_page': 50},
+                      timeout=HTTP_TIMEOUT)
+    req.raise_for_status()
+    return {build['nvr'] for update in orjson.loads(req.content)['updates'] for build in update['builds']}
+
+
+def get_missing_updates(component, fedoras, refresh=False):
+    """
+    Check for existing Koji builds that have no Bodhi update published for any
+    active Fedora release. Returns the builds that need an update by release.
+    """
+    version = get_latest_dist_git_release(component, refresh)
     print(f"      Version {component} {version} found in dist-git")
 
-    updates = set()
+    updates = {}
 
     # TODO: Drop this ugly workaround once koji-osbuild 7 gets released
     release = "1"
     if component == "koji-osbuild":
         release = "0"
 
+    nvrs = {fedora: f'{component}-{version}-{release}.fc{fedora}' for fedora in fedoras}
+    # Koji and Bodhi don't depend on each other, so ask both at the same time
+    # and look up all builds in Bodhi rather than just the completed ones.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        koji_query = executor.submit(get_complete_koji_builds, list(nvrs.values()))
+        bodhi_query = executor.submit(get_bodhi_updates, list(nvrs.values()))
+    builds = koji_query.result()
+    published = bodhi_query.result()
+    complete = [fedora for fedora, nvr in nvrs.items() if nvr in builds]
+
     for fedora in fedoras:
-        res = run_command(['koji', 'buildinfo', f'{component}-{version}-{release}.fc{fedora}'])
-        if "State: COMPLETE" in res:
+        if fedora in complete:
             print(f"      Fedora {fedora}: ✅ Build for {component} {version} is available in Koji")
-            res = run_command(['bodhi', 'updates', 'query', '--builds', f'{component}-{version}-{release}.fc{fedora}'])
-            if "0 updates found" in res:
+            if nvrs[fedora] not in published:
                 print(f"      Fedora {fedora}: No Bodhi update for {component} {version}")
-                updates.add(fedora)
+                updates[fedora] = nvrs[fedora]
             else:
                 print(f"      Fedora {fedora}: ✅ Update for {component} {version} is available in Bodhi")
         else:
             msg_info(f"WARNING: There is no build for {component} {version} in Fedora {fedora}. Probably packit is still doing its thing...")
 
-    return list(updates)
+    return updates
 
 
-def get_fedora_releases():
-    """Get all active Fedora releases (exluding rawhide)"""
+@functools.lru_cache(maxsize=None)
+def get_fedora_releases(refresh=False):
+    """
+    Get all active Fedora releases (exluding rawhide). The list only changes
+    every few months, so it is cached on disk for RELEASES_CACHE_TTL unless
+    a refresh is requested.
+    """
+    # Caches written before the ETag was stored hold a plain list, they are
+    # treated like a missing cache and replaced.
+    cache_file = cache_dir('releases.json')
+    if not refresh:
+        cached = read_cache(cache_file, RELEASES_CACHE_TTL)
+        if isinstance(cached, dict):
+            return cached['releases']
+
+    # An expired entry can still be revalidated, which saves the download
+    # whenever Bodhi supports conditional requests for the list.
+    headers = {}
+    stale = None if refresh else read_cache(cache_file, math.inf)
+    if not isinstance(stale, dict):
+        stale = None
+    elif stale.get('etag'):
+        headers['If-None-Match'] = stale['etag']
+
     # https://github.com/sgallagher/get-fedora-releases-action/blob/main/get_fedora_releases.py
-    res = None
-    while not res:
-        try:
-            res = requests.get('https://bodhi.fedoraproject.org/releases?state=current')
-        except requests.exceptions.Timeout:
-            pass
-        except requests.exceptions.HTTPError as err:
-            msg_error(err)
+    try:
+        res = SESSION.get('https://bodhi.fedoraproject.org/releases?state=current', headers=headers, timeout=HTTP_TIMEOUT)
+        res.raise_for_status()
+    except requests.exceptions.RequestException as err:
+        msg_error(err)
+
+    if res.status_code == 304:
+        write_cache(cache_file, stale)
+        return stale['releases']
 
     stable = set()
-    for release in res.json()['releases']:
+    for release in orjson.loads(res.content)['releases']:
         if release['id_prefix'] == "FEDORA":
             stable.add(release['version'])
 
+    write_cache(cache_file, {'etag': res.headers.get('ETag'), 'releases': list(stable)})
     return list(stable)
 
 
+def process_component(args, component, num_tests, fedoras):
+    """
+    Merge the open pull requests of a component and return the Fedora releases
+    that have no Bodhi update yet, mapped to their builds. Components are
+    independent of each other, so they can be processed concurrently.
+    """
+    try:
+        if args.apikey:
+            msg_info(f"Checking for open pull requests of {component}...")
+            merge_open_pull_requests(args, component, num_tests)
+        else:
+            msg_info(f"No Fedora account API key supplied - skipping merging of pull requests of {component}.")
+
+        if args.user and args.password: # Only check Bodhi if credentials were supplied
+            msg_info(f"Checking for missing updates of '{component}'...")
+            missing_updates = get_missing_updates(component, fedoras, args.refresh)
+            if not missing_updates:
+                msg_ok(f"No releases found with missing updates of '{component}'.")
+            return missing_updates
+
+        msg_info(f"No Fedora credentials supplied - skipping Bodhi updates of {component}.")
+    except Exception as error:
+        print(f"Failure in processing component [{component}] - skipping")
+        print(f"Exception: {error=}, {type(error)=}")
+
+    return {}
+
+
 def main():
     """Main function"""
     parser = argparse.ArgumentParser()
@@ -302,42 +486,44 @@ def main():
     parser.add_argument("-u", "--user", help="Set the username of the Fedora account")
     parser.add_argument("-p", "--password", help="Set the Fedora account password")
     parser.add_argument("--apikey", help="Set the Fedora account API key")
+    parser.add_argument("--refresh", action='store_true', help="Ignore cached data and query the Fedora services again")
     args = parser.parse_args()
 
     if not args.component:
         parser.error("Need to specify at least one --component")
 
-    fedoras = get_fedora_releases()
-
+    components = []
     for component_numtests in args.component:
         try:
             component, num_tests = component_numtests.split(':')
             num_tests = int(num_tests)
         except ValueError:
             parser.error(f"Invalid component format, must be PACKAGE:NUM_TESTS : {component_numtests}")
+        components.append((component, num_tests))
+
+    fedoras = get_fedora_releases(args.refresh)
+
+    # Checking the components is mostly waiting for Fedora's services, so do
+    # it for several of them at once. Publishing the updates stays serial so
+    # the output of each component appears as one block under its header.
+    with ThreadPoolExecutor(max_workers=min(len(components), COMPONENT_WORKERS)) as executor:
+        missing = list(executor.map(lambda c: process_component(args, *c, fedoras), components))
+
+    # Fail loudly before publishing anything rather than once per update
+    if any(missing):
+        check_bodhi_client()
+
+    for (component, _), missing_updates in zip(components, missing):
+        if not missing_updates:
+            continue
 
         print(f"\n--- {component} ---\n")
         try:
-            if args.apikey:
-                msg_info(f"Checking for open pull requests of {component}...")
-                merge_open_pull_requests(args, component, num_tests)
-            else:
-                msg_info("No Fedora account API key supplied - skipping merging of pull requests.")
-
-            if args.user and args.password: # Only check Bodhi if credentials were supplied
-                msg_info(f"Checking for missing updates of '{component}'...")
-                missing_updates = get_missing_updates(component, fedoras)
-
-                if missing_updates:
-                    msg_info(f"Found missing updates in Bodhi: {missing_updates}")
-                    publish_updates(args, component, missing_updates)
-                    msg_ok(f"Tried to update {missing_updates}.")
-                else:
-                    msg_ok("No releases found with missing updates.")
-            else:
-                msg_info("No Fedora credentials supplied - skipping Bodhi updates.")
+            msg_info(f"Found missing updates in Bodhi: {list(missing_updates)}")
+            publish_updates(args, component, missing_updates)
+            msg_ok(f"Tried to update {list(missing_updates)}.")
         except Exception as error:
-            print(f"Failure in processing component [{component}] - skipping")
+            print(f"Failure in publishing updates for component [{component}] - skipping")
             print(f"Exception: {error=}, {type(error)=}")
 
 
@@ -2,18 +2,52 @@
 import os
 import sys
 import argparse
+import functools
+import types
 import yaml
+import orjson
 import requests
+from requests.adapters import HTTPAdapter, Retry
 from datetime import date, timedelta
 from cryptography.fernet import Fernet
 from slack_sdk.webhook import WebhookClient
 
+# libyaml's C loader is much faster, fall back to the pure Python one without it
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Where reminders are posted and the link to this run they refer to
+SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL')
+GITHUB_URL = f"{os.getenv('GITHUB_SERVER_URL')}/{os.getenv('GITHUB_REPOSITORY')}/actions/runs/{os.getenv('GITHUB_RUN_ID')}"
+
+# Seconds to wait for GitHub to accept a connection and to respond
+GITHUB_TIMEOUT = (3.05, 10)
+
+
+def github_http_client() -> requests.Session:
+    """
+    Returns a http client for the GitHub API that retries on transient
+    errors and keeps its connection alive between requests
+    """
+    retry_adapter = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[502, 503, 504],
+    )
+    session = requests.Session()
+    session.headers["Accept"] = "application/vnd.github+json"
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retry_adapter))
+    return session
+
+
+SESSION = github_http_client()
+
 
 def load_key(keyfile: str):
     """
     Loads the key from the current directory named `key.key`
     """
-    return open(keyfile, "rb").read()
+    with open(keyfile, "rb") as file:
+        return file.read()
 
 
 def decrypt(filename: str, key: bytes):
@@ -32,144 +66,174 @@ def all_wednesdays(year: int):
     """
     Returns all Wednesdays of a given year
     """
-    d = date(year, 1, 1)
-    d += timedelta(days = 2 - d.weekday())
-    if d.year != year:
-        d += timedelta(days = 2 - d.weekday() + 7)
-    
-    while d.year == year:
-        yield d
-        d += timedelta(days = 7)
+    start = date(year, 1, 1).toordinal()
+    first = start + (2 - date.fromordinal(start).weekday()) % 7
+    for ordinal in range(first, date(year + 1, 1, 1).toordinal(), 7):
+        yield date.fromordinal(ordinal)
+
+
+def write_release_plan(component: str, year: int, release_dates):
+    """
+    Writes the yaml file holding an empty release plan for a component
+    """
+    with open(f'{year}-{component}.yaml','w') as file:
+        file.writelines(f"{d}: \n" for d in release_dates)
 
 
 def create_yearly_plan(components, year: int):
     """
     Generate a yaml file holding an empty release plan for a component (every second Wednesday)
     """
-    for component in components:
-        with open(f'{year}-{component}.yaml','w') as file:
-            i = components.index(component)
-            lines = ""
-            for d in all_wednesdays(year):
-                if i % 2:
-                    lines += f"{d}: \n"
-                i += 1
-            file.write(lines)
+    wednesdays = list(all_wednesdays(year))
+    for offset, component in enumerate(components):
+        # The components take turns, the second one starts on the first Wednesday
+        write_release_plan(component, year, wednesdays[(offset + 1) % 2::2])
 
 
-def release_schedule(component: str):
+@functools.lru_cache(maxsize=None)
+def release_schedule(component: str, year: int):
     """
-    Reads the release schedule yaml file and returns it
+    Reads the release schedule yaml file of a year and returns it (read-only, as it is cached)
     """
-    d = date.today()
-    filename = f'{d.year}-{component}.yaml'
+    filename = f'{year}-{component}.yaml'
     if os.path.isfile(filename):
-        with open(filename,'r') as file:
-            release_dates = yaml.load(file, Loader=yaml.FullLoader)
+        with open(filename,'rb') as file:
+            release_dates = yaml.load(file.read(), Loader=YamlLoader)
     else:
         print(f"Error. The {filename} was not found. Please create it first by running 'python3 reminder_bot.py --year'.")
         sys.exit(1)
 
-    return release_dates
+    # An empty file is an empty schedule
+    return types.MappingProxyType(release_dates or {})
 
 
-def slack_notify(message: str):
+@functools.lru_cache(maxsize=None)
+def release_months(component: str, year: int):
     """
-    Sends a Slack notification to the #osbuild-release channel
+    Returns the release dates and forepersons of a component in a year grouped by month
     """
-    url = os.getenv('SLACK_WEBHOOK_URL')
-    github_server_url = os.getenv('GITHUB_SERVER_URL')
-    github_repository = os.getenv('GITHUB_REPOSITORY')
-    github_run_id = os.getenv('GITHUB_RUN_ID')
-    github_url = f"{github_server_url}/{github_repository}/actions/runs/{github_run_id}"
+    months = {}
+    for release_date, foreperson in release_schedule(component, year).items():
+        months.setdefault(release_date.month, []).append((release_date, foreperson))
+    return months
+
 
-    print(message)
+@functools.lru_cache(maxsize=None)
+def slack_webhook():
+    """
+    Returns the Slack webhook client, created once on first use
+    """
+    return WebhookClient(SLACK_WEBHOOK_URL)
 
-    if url:
-        webhook = WebhookClient(url)
 
-        response = webhook.send(
+def slack_notify(*messages: str):
+    """
+    Sends a Slack notification to the #osbuild-release channel, with one
+    section per message
+    """
+    for message in messages:
+        print(message)
+
+    if SLACK_WEBHOOK_URL:
+        response = slack_webhook().send(
             text="fallback",
             blocks=[
                 {
                     "type": "section",
                     "text": {
                         "type": "mrkdwn",
-                        "text": f"<{github_url}|reminder-bot>: :loudspeaker: {message}"
+                        "text": f"<{GITHUB_URL}|reminder-bot>: :loudspeaker: {message}"
                     }
                 }
+                for message in messages
             ])
-        assert response.status_code == 200
-        assert response.body == "ok"
+        if response.status_code != 200 or response.body != "ok":
+            raise RuntimeError(f"Slack notification failed: {response.status_code} {response.body!r}")
 
 
-def send_reminder(components, slack_nicks, target_date, message: str):
+def slack_mentions(slack_nicks):
     """
-    Reads the release overviews and sends reminders appropriately
+    Returns the Slack mentions indexed by full name and by every part of the
+    name, so forepersons can be looked up by their first name
     """
-    overview = []
+    mentions = {}
+    for name, userid in slack_nicks.items():
+        for key in [name] + name.split():
+            mentions.setdefault(key, f"<@{userid}>")
+    return mentions
 
-    for component in components:
-        releases = release_schedule(component)
-
-        for release_date, foreperson in releases.items():
-            if foreperson:
-                for name, userid in slack_nicks.items():
-                    if foreperson in name:
-                        foreperson = f"<@{userid}>"
 
-            if (target_date == date.today().month and target_date == release_date.month):
-                overview.append(f"{release_date}: {component} release by {foreperson}\n")
-            elif release_date == target_date:
-                internal_guide = "https://osbuild.pages.redhat.com/internal-guides/releasing.html"
-                instructions = (f"*1.* Watch this channel for the CS9/RHEL9 merge requests (<{internal_guide}|read the docs>)\n"
-                                "*2.* Once everything is green, merge the CS9 merge request and watch this channel for the RHEL8 pull request.\n")
-                slack_notify(f'{message} <https://github.com/osbuild/{component}/releases|{component} release> by {foreperson}\n{instructions}')
+def send_reminder(components, mentions, year: int, target_date, message: str):
+    """
+    Reads the release overviews of the given year and sends reminders
+    appropriately. The target date is either a day (date), to remind of the
+    releases on that day, or a month (int), to send an overview of its releases
+    """
+    if isinstance(target_date, int):
+        overview = []
+        for component in components:
+            for release_date, foreperson in release_months(component, year).get(target_date, []):
+                overview.append(f"{release_date}: {component} release by {mentions.get(foreperson, foreperson)}\n")
+
+        if overview:
+            overview.sort()
+            slack_notify(f"{message}\n{''.join(overview)}")
+        return
+
+    # Releases of several components on the same day go out in one notification
+    reminders = []
+    for component in components:
+        releases = release_schedule(component, year)
+        if target_date in releases:
+            foreperson = mentions.get(releases[target_date], releases[target_date])
+            internal_guide = "https://osbuild.pages.redhat.com/internal-guides/releasing.html"
+            instructions = (f"*1.* Watch this channel for the CS9/RHEL9 merge requests (<{internal_guide}|read the docs>)\n"
+                            "*2.* Once everything is green, merge the CS9 merge request and watch this channel for the RHEL8 pull request.\n")
+            reminders.append(f'{message} <https://github.com/osbuild/{component}/releases|{component} release> by {foreperson}\n{instructions}')
 
-    if overview:
-        overview.sort()
-        slack_notify(f"{message}\n{''.join(overview)}")
+    if reminders:
+        slack_notify(*reminders)
 
 
-def frontend_reminder(slack_nicks):
+def frontend_reminder(slack_nicks, today: date):
     """
     Checks if there are dependabot PRs open against the frontend for >7 days
     """
     repo = 'image-builder-frontend'
     owner = 'RedHatInsights'
     days = 7
-    one_week = date.today() - timedelta(days = days)
+    one_week = today - timedelta(days = days)
 
     payload = { "q":f'type:pr is:open repo:{owner}/{repo} label:dependencies created:<{one_week}' }
 
     print(payload)
     try:
-        req = requests.get("https://api.github.com/search/issues", params=payload)
-        res = req.json()
-    except:
+        req = SESSION.get("https://api.github.com/search/issues", params=payload, timeout=GITHUB_TIMEOUT)
+        req.raise_for_status()
+        res = orjson.loads(req.content)
+    except (requests.exceptions.RequestException, ValueError):
         print(f"Couldn't get PR infos for {owner}/{repo}.")
-        res = None
+        return
 
-    if req.status_code == 200 and res is not None:
-        items = res["items"]
-        pull_requests = ""
+    items = res["items"]
+    pull_requests = ""
 
-        frontend_devs = [ "Lucas Garfield", "Klara Simickova" ]
-        pings = ""
+    frontend_devs = [ "Lucas Garfield", "Klara Simickova" ]
+    pings = ""
 
-        for name, userid in slack_nicks.items():
-            if name in frontend_devs:
-                pings += f" <@{userid}>"
+    for name in frontend_devs:
+        if name in slack_nicks:
+            pings += f" <@{slack_nicks[name]}>"
 
-        if len(items) > 0:
-            for item in items:
-                print(f"{item['html_url']}")
-                pull_requests += f" *<{item['html_url']}|#{item['number']}>*"
+    if len(items) > 0:
+        for item in items:
+            print(f"{item['html_url']}")
+            pull_requests += f" *<{item['html_url']}|#{item['number']}>*"
 
-            text = "pull requests have"
-            if len(items) == 1:
-                text = "pull request has"
-            slack_notify(f"{len(items)} dependabot {text} been open for more than {days} days:{pull_requests} {pings}")
+        text = "pull requests have"
+        if len(items) == 1:
+            text = "pull request has"
+        slack_notify(f"{len(items)} dependabot {text} been open for more than {days} days:{pull_requests} {pings}")
 
 
 if __name__ == "__main__":
@@ -191,18 +255,22 @@ if __name__ == "__main__":
 
     key = os.getenv('SLACK_NICKS_KEY')
     if key:
-        slack_nicks = yaml.safe_load(decrypt("slack_nicks_encrypted.yaml", key))
+        slack_nicks = yaml.load(decrypt("slack_nicks_encrypted.yaml", key), Loader=YamlLoader)
+        mentions = slack_mentions(slack_nicks)
+
+    # All reminders of a run refer to the same day, even if it runs past midnight
+    today = date.today()
 
     if args.reminder is True:
-        wednesday = date.today() - timedelta(days=2)
+        wednesday = today + timedelta(days=2)
         message = f"*This Wednesday* ({wednesday}) we have scheduled an"
-        send_reminder(components, slack_nicks, date.today() + timedelta(days=2), message) # send reminder on Monday before the release
+        send_reminder(components, mentions, today.year, wednesday, message)            # send reminder on Monday before the release
         message = "*Today* we have scheduled an"
-        send_reminder(components, slack_nicks, date.today(), message)                     # send a reminder on the release day
+        send_reminder(components, mentions, today.year, today, message)                # send a reminder on the release day
 
     if args.monthly is True:
         message = f":rocket: *Upcoming releases for {' and '.join(components)}* :rocket:"
-        send_reminder(components, slack_nicks, date.today().month, message)               # send an overview on the first of the month
+        send_reminder(components, mentions, today.year, today.month, message)          # send an overview on the first of the month
 
-    if args.frontend is True and date.weekday(date.today()) == 0:                         # send frontend reminders only on Mondays
-        frontend_reminder(slack_nicks)
+    if args.frontend is True and today.weekday() == 0:                                 # send frontend reminders only on Mondays
+        frontend_reminder(slack_nicks, today)